@@ -4,8 +4,191 @@
 
 from pythonosc import osc_message_builder
 from pythonosc import udp_client
+import atexit
+import functools
+import os
 import signal
+import socket
+import struct
 import sys
+import threading
+import time
+import weakref
+
+
+# The signals that make us turn off all the notes before quitting.
+PANIC_SIGNALS = [getattr(signal, name) for name in
+                 ("SIGINT", "SIGTERM", "SIGHUP") if hasattr(signal, name)]
+
+# The largest OSC bundle we send, in bytes. Small enough to fit in one
+# ethernet frame, so a bundle never gets fragmented.
+MAX_BUNDLE_SIZE = 1400
+
+# An OSC bundle header with the "immediately" time tag.
+BUNDLE_HEADER = b"#bundle\x00" + struct.pack(">Q", 1)
+
+
+@functools.lru_cache(maxsize=None)
+def note_off_dgram(chan, typ, note):
+    """ The encoded OSC message that turns off a note. These are cached,
+        so each one only gets encoded once. """
+
+    builder = osc_message_builder.OscMessageBuilder(
+        address="/vkb_midi/" + str(chan) + "/" + typ + "/" + str(note))
+    builder.add_arg(0)
+    return builder.build().dgram
+
+
+def pack_bundles(dgrams, max_size=MAX_BUNDLE_SIZE):
+    """ Pack encoded OSC messages into as few encoded OSC bundles as
+        possible, without making any bundle bigger than max_size bytes
+        unless a single message doesn't fit on its own. """
+
+    bundles = []
+    bundle = bytearray(BUNDLE_HEADER)
+
+    for dgram in dgrams:
+        element = struct.pack(">i", len(dgram)) + dgram
+
+        # Start a new bundle if this message won't fit in the current one.
+        if len(bundle) > len(BUNDLE_HEADER) and \
+                len(bundle) + len(element) > max_size:
+            bundles.append(bytes(bundle))
+            bundle = bytearray(BUNDLE_HEADER)
+
+        bundle += element
+
+    if len(bundle) > len(BUNDLE_HEADER):
+        bundles.append(bytes(bundle))
+
+    return bundles
+
+
+class SystemClock:
+    """ The clock BitwigOSC uses by default, which tells the real time and
+        really sleeps. """
+
+    def now(self):
+        """ The current time in seconds. Only useful for measuring how much
+            time has passed between two calls. """
+
+        return time.monotonic()
+
+    def now_ns(self):
+        """ The current time in nanoseconds. """
+
+        return time.monotonic_ns()
+
+    def sleep(self, seconds):
+        """ Wait for the number of seconds in the seconds param. """
+
+        time.sleep(seconds)
+
+
+class VirtualClock:
+    """ A clock for tests, where sleeping returns right away and moves the
+        clock forward instead. The time is kept in whole nanoseconds, so it
+        doesn't drift no matter how many times you sleep. """
+
+    def __init__(self, start_ns=0):
+        """ Start the clock at start_ns nanoseconds. """
+
+        self.ns = start_ns  # The current virtual time in nanoseconds.
+
+    def now(self):
+        """ The current virtual time in seconds. """
+
+        return self.ns / 1e9
+
+    def now_ns(self):
+        """ The current virtual time in nanoseconds. """
+
+        return self.ns
+
+    def sleep(self, seconds):
+        """ Move the clock forward by the number of seconds in the seconds
+            param, without actually waiting. """
+
+        if seconds < 0:
+            raise ValueError("sleep length must be non-negative")
+
+        self.ns += round(seconds * 1e9)
+
+
+class PanicHandler:
+    """ Turns off the playing notes of every BitwigOSC instance when the
+        program exits, or when it gets a signal like ctrl-c. It is
+        registered with atexit and the signals in PANIC_SIGNALS the first
+        time an instance is added, and calls the signal handlers that were
+        there before it, instead of replacing them. """
+
+    def __init__(self):
+        """ Start with no instances and nothing registered. """
+
+        self.instances = weakref.WeakSet()  # The instances to silence.
+        self.previous = {}                  # The replaced signal handlers.
+        self.registered = False             # Whether atexit is set up.
+
+    def add(self, bw):
+        """ Silence the BitwigOSC instance in the bw param on exit. """
+
+        self.instances.add(bw)
+        self.register()
+
+    def register(self):
+        """ Register with atexit and the signals, if we haven't yet. """
+
+        if not self.registered:
+            atexit.register(self.panic)
+            self.registered = True
+
+        # Signal handlers can only be set from the main thread.
+        if self.previous or \
+                threading.current_thread() is not threading.main_thread():
+            return
+
+        for sig in PANIC_SIGNALS:
+            self.previous[sig] = signal.getsignal(sig)
+            signal.signal(sig, self.signal_handler)
+
+    def panic(self):
+        """ Turn off the playing notes of every instance, all within the
+            smallest panic_budget of any of them. """
+
+        instances = list(self.instances)
+        if not instances:
+            return
+
+        # Share one deadline, so more instances don't take any longer.
+        deadline = time.monotonic() + \
+            min(bw.panic_budget for bw in instances)
+
+        for bw in instances:
+            bw.panic(deadline)
+
+    def signal_handler(self, sig, frame):
+        """ Turn off all the notes, then do whatever would have happened
+            without us. For ctrl-c that usually means raising
+            KeyboardInterrupt. """
+
+        self.panic()
+
+        previous = self.previous.get(sig)
+
+        # Chain to the handler that was there before us.
+        if callable(previous):
+            previous(sig, frame)
+            return
+        if previous == signal.SIG_IGN:
+            return
+
+        # Let the default handler kill the program.
+        signal.signal(sig, signal.SIG_DFL)
+        os.kill(os.getpid(), sig)
+
+
+# The panic handler all BitwigOSC instances are added to.
+panic_handler = PanicHandler()
 
 
 class BitwigOSC:
@@ -14,11 +197,16 @@ class BitwigOSC:
 
         API: https://github.com/git-moss/DrivenByMoss/wiki/Open-Sound-Control-(OSC) """
 
-    def __init__(self, ip="127.0.0.1", port=8000, chan=1):
+    def __init__(self, ip="127.0.0.1", port=8000, chan=1, clock=None,
+                 panic_redundancy=3, panic_budget=0.005):
         """ Set the OSC server's IP and port while instantiating the OSC 
-            client, and set the default MIDI channel to use. """
+            client, and set the default MIDI channel to use. Pass a 
+            VirtualClock as the clock param if you don't want wait() to 
+            really wait, like in tests.
 
-        signal.signal(signal.SIGINT, self.signal_handler)
+            When panicking, the note offs are sent panic_redundancy times
+            in case some UDP packets get lost, but the repeats stop once
+            panic_budget seconds have passed. """
 
         # Save some vars for later.
         self.ip = ip              # The OSC server IP.
@@ -28,15 +216,80 @@ class BitwigOSC:
         self.drum_notes_on = {}   # The notes that are currently on.
         self.last_note = 0        # The last note that was played.
 
+        # The clock used for waiting between messages.
+        self.clock = clock if clock is not None else SystemClock()
+
         # Instantiate an OSC UDP client.
         self.client = udp_client.SimpleUDPClient(ip, port)
 
+        # Set up a separate socket for panicking ahead of time, so it still
+        # works while the program is shutting down.
+        self.panic_redundancy = panic_redundancy  # Times to send note offs.
+        self.panic_budget = panic_budget          # Seconds to keep sending.
+        self.panic_dgrams = {}  # Encoded note offs for the notes that are on.
+        family, _, _, _, self.panic_addr = socket.getaddrinfo(
+            ip, port, 0, socket.SOCK_DGRAM)[0]
+        self.panic_sock = socket.socket(family, socket.SOCK_DGRAM)
+
+        # Turn off our notes when the program exits or is interrupted.
+        panic_handler.add(self)
+
     def __del__(self):
         """ Cleanup when object is destroyed. """
 
+        # Nothing to clean up if __init__ didn't finish.
+        if getattr(self, "panic_sock", None) is None:
+            return
+
         # Stop all the notes that are currently playing.
-        self.stop_all_playing_notes()
-        self.stop_all_playing_notes("drum")
+        self.panic()
+        self.panic_sock.close()
+
+    def panic(self, deadline=None):
+        """ Turn off all the notes that are currently playing, as fast as 
+            possible. Each note off is encoded when its note starts, so all
+            that's left to do here is pack them into as few OSC bundles as
+            possible and send them, straight through a socket of our own. 
+            This runs automatically when the program exits or gets 
+            interrupted.
+
+            Sending stops once the deadline param, a time.monotonic() 
+            value, has passed, although the first bundle always gets sent.
+            By default the deadline is panic_budget seconds from now. """
+
+        if deadline is None:
+            deadline = time.monotonic() + self.panic_budget
+
+        dgrams = self.panic_dgrams
+
+        # Forget about the notes, so they aren't turned off twice. New
+        # containers are swapped in instead of clearing the old ones, in 
+        # case we interrupted code that is using them.
+        self.panic_dgrams = {}
+        self.synth_notes_on = {}
+        self.drum_notes_on = {}
+
+        bundles = pack_bundles(list(dgrams.values()))
+
+        # Send all the bundles once, then repeat them while there's time.
+        first = True
+        for _ in range(self.panic_redundancy):
+            for bundle in bundles:
+                if not first and time.monotonic() >= deadline:
+                    return
+                first = False
+
+                try:
+                    self.panic_sock.sendto(bundle, self.panic_addr)
+                except OSError:
+                    return
+
+    def wait(self, seconds):
+        """ Wait for the number of seconds in the seconds param, using this
+            instance's clock. Use this instead of time.sleep() between
+            messages, so the timing can be sped up in tests. """
+
+        self.clock.sleep(seconds)
 
     # --- Receive - Global ---
     # API route: /
@@ -388,6 +641,8 @@ class BitwigOSC:
                 self.synth_notes_on[note] = True
             else:
                 self.drum_notes_on[note] = True
+            self.panic_dgrams[(chan, typ, note)] = note_off_dgram(
+                chan, typ, note)
 
         # Otherwise set the note as off in our records.
         else:
@@ -395,6 +650,7 @@ class BitwigOSC:
                 self.synth_notes_on.pop(note, None)
             else:
                 self.drum_notes_on.pop(note, None)
+            self.panic_dgrams.pop((chan, typ, note), None)
 
         # Save this note so we can keep track of the most recent note played.
         self.last_note = note
@@ -418,11 +674,13 @@ class BitwigOSC:
         # Set the note as off in our records.
         if typ == "note" or typ == "both":
             self.synth_notes_on.pop(note, None)
+            self.panic_dgrams.pop((chan, "note", note), None)
             # Send the note message to the OSC server to turn off the note.
             self.client.send_message("/vkb_midi/" + str(chan) +
                                      "/note/" + str(note), 0)
         if typ == "drum" or typ == "both":
             self.drum_notes_on.pop(note, None)
+            self.panic_dgrams.pop((chan, "drum", note), None)
             # Send the note message to the OSC server to turn off the note.
             self.client.send_message("/vkb_midi/" + str(chan) +
                                      "/drum/" + str(note), 0)
@@ -431,9 +689,7 @@ class BitwigOSC:
         """ Send velocity 0 to all notes that are currently playing, to turn 
             them off. Pass in "drum" as the typ param if you want to stop all 
             the drum notes that are currently playing, pass "both" to stop 
-            all types of notes. This is being used as a trap function that 
-            runs when you press ctrl-c, so there aren't any lingering notes 
-            when the program exits. """
+            all types of notes. """
 
         # Use default MIDI channel if chan argument not specified.
         if chan == None:
@@ -491,13 +747,16 @@ class BitwigOSC:
     # --- End Receive - Play ---
 
     def signal_handler(self, sig, frame):
-        """ This runs when you press ctrl-c to stop the program. """
+        """ Turn off all the notes and quit with status 0. The panic 
+            handler already turns off the notes when you press ctrl-c and 
+            then raises KeyboardInterrupt, so you only need this if you 
+            want the old quiet exit instead. Install it with 
+            signal.signal(signal.SIGINT, bw.signal_handler). """
 
         print('You pressed ctrl-c. Turning off all notes and quitting...')
 
         # Stop all the notes that are currently playing.
-        self.stop_all_playing_notes()
-        self.stop_all_playing_notes("drum")
+        self.panic()
 
         # Exit the program indicating no error.
         sys.exit(0)
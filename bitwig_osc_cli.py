@@ -0,0 +1,219 @@
+""" Bitwig OSC Python3 command runner.
+
+    Reads BitwigOSC commands, one per line, from stdin or a file, and sends
+    them all through a single OSC client. Each line is the name of a
+    BitwigOSC method followed by its arguments, separated by spaces:
+
+        record_arm_track 3
+        play_note 60 100
+        raw_tempo 420
+
+    Blank lines and lines starting with # are ignored. Arguments that look
+    like integers or floats are sent as numbers, anything else (like "-" or
+    "latch") is sent as a string.
+
+    Usage:
+        python bitwig_osc_cli.py --ip 127.0.0.1 --port 8000 commands.txt
+        echo "play_note 60 100" | python bitwig_osc_cli.py """
+
+from bitwig_osc import BitwigOSC, pack_bundles
+from pythonosc import osc_bundle
+from pythonosc import osc_message_builder
+import argparse
+import sys
+
+
+# Methods which can't be called as commands, even though they are public.
+EXCLUDED_COMMANDS = ("signal_handler",)
+
+
+class BundlingClient:
+    """ Stands in for the SimpleUDPClient of a BitwigOSC instance, and
+        collects the messages it is asked to send into OSC bundles instead
+        of sending each one in its own UDP packet. Call flush() to send the
+        collected messages. """
+
+    def __init__(self, client):
+        """ Wrap the OSC client that the bundles will be sent with. """
+
+        self.client = client  # The OSC client we send bundles with.
+        self.messages = []    # The messages waiting to be sent.
+
+    def send_message(self, address, value):
+        """ Build an OSC message and save it for the next flush(). Raises
+            BuildError right away if the value can't be encoded. """
+
+        builder = osc_message_builder.OscMessageBuilder(address=address)
+        builder.add_arg(value)
+        self.messages.append(builder.build())
+
+    def flush(self):
+        """ Send all the saved messages in as few OSC bundles as possible,
+            keeping each bundle small enough to fit in one UDP packet. """
+
+        dgrams = [msg.dgram for msg in self.messages]
+        self.messages = []
+
+        for dgram in pack_bundles(dgrams):
+            self.client.send(osc_bundle.OscBundle(dgram))
+
+
+def parse_arg(arg):
+    """ Convert a command argument to an int or float if it looks like one,
+        otherwise leave it as a string. """
+
+    try:
+        return int(arg)
+    except ValueError:
+        pass
+
+    try:
+        return float(arg)
+    except ValueError:
+        return arg
+
+
+def parse_command(bw, line):
+    """ Turn a line of text into a BitwigOSC method and its arguments.
+        Returns None for blank lines and comments, and raises ValueError
+        if the command isn't a BitwigOSC method. """
+
+    words = line.split()
+
+    # Skip blank lines and comments.
+    if not words or words[0].startswith("#"):
+        return None
+
+    name = words[0]
+
+    # Only allow the public BitwigOSC methods to be used as commands.
+    if name.startswith("_") or name in EXCLUDED_COMMANDS:
+        raise ValueError("Unknown command: " + name)
+    method = getattr(bw, name, None)
+    if not callable(method):
+        raise ValueError("Unknown command: " + name)
+
+    return method, [parse_arg(arg) for arg in words[1:]]
+
+
+def flush(client, lineno, err):
+    """ Flush a BundlingClient, reporting any error that happens while
+        sending. Returns False if the bundles couldn't be sent. """
+
+    try:
+        client.flush()
+    except OSError as e:
+        print("line " + str(lineno) + ": " + str(e), file=err)
+        return False
+
+    return True
+
+
+def run(bw, lines, batch=1, interval=0.0, err=sys.stderr):
+    """ Run each command from lines on the BitwigOSC instance. If batch is
+        larger than 1, the messages from that many commands are sent
+        together in one OSC bundle. If interval is larger than 0, wait that
+        many seconds after sending each command, or each bundle when
+        batching. Returns the number of commands that failed. """
+
+    errors = 0   # The number of commands that failed.
+    pending = 0  # The number of commands waiting to be sent in a bundle.
+    lineno = 0   # The line number of the last command read.
+
+    # Collect the messages into bundles if we are batching.
+    client = bw.client
+    if batch > 1:
+        bw.client = BundlingClient(client)
+
+    try:
+        for lineno, line in enumerate(lines, 1):
+            try:
+                command = parse_command(bw, line)
+                if command is None:
+                    continue
+
+                method, args = command
+                method(*args)
+            except (ValueError, TypeError, OSError,
+                    osc_message_builder.BuildError) as e:
+                print("line " + str(lineno) + ": " + str(e), file=err)
+                errors += 1
+                continue
+
+            # Send the bundle once it is full.
+            if batch > 1:
+                pending += 1
+                if pending < batch:
+                    continue
+                pending = 0
+                if not flush(bw.client, lineno, err):
+                    errors += 1
+
+            # Wait a bit before sending the next command.
+            if interval > 0:
+                bw.wait(interval)
+
+        # Send any leftover messages.
+        if batch > 1 and not flush(bw.client, lineno, err):
+            errors += 1
+
+    finally:
+        # Put the real client back so it can be used directly again.
+        bw.client = client
+
+    return errors
+
+
+def main(argv=None):
+    """ The bitwig-osc command line entry point. """
+
+    # We want to accept some arguments from the command line.
+    parser = argparse.ArgumentParser(
+        description="Send BitwigOSC commands, one per line, to Bitwig.")
+
+    # File to read the commands from.
+    parser.add_argument("file", nargs="?", default="-",
+                        type=argparse.FileType("r"),
+                        help="The file to read commands from. Reads from "
+                        "stdin if not specified, or if it is -.")
+
+    # OSC Server IP.
+    parser.add_argument("--ip", default="127.0.0.1",
+                        help="The IP of the OSC server.")
+
+    # OSC Server port.
+    parser.add_argument("--port", type=int, default=8000,
+                        help="The port the OSC server is listening on.")
+
+    # Default MIDI channel to use.
+    parser.add_argument("--chan", type=int, default=1,
+                        help="The default MIDI channel to send all commands to.")
+
+    # How many commands to send together in one OSC bundle.
+    parser.add_argument("--batch", type=int, default=1,
+                        help="Send the messages from this many commands "
+                        "together in one OSC bundle.")
+
+    # How long to wait between sends.
+    parser.add_argument("--interval", type=float, default=0.0,
+                        help="The number of seconds to wait after sending "
+                        "each command, or each bundle when batching.")
+    args = parser.parse_args(argv)
+
+    if args.batch < 1:
+        parser.error("--batch must be at least 1")
+    if args.interval < 0:
+        parser.error("--interval can't be negative")
+
+    # Instantiate our Bitwig OSC client library with the command line arguments.
+    bw = BitwigOSC(args.ip, args.port, args.chan)
+
+    # Run all the commands through the same client.
+    with args.file:
+        errors = run(bw, args.file, args.batch, args.interval)
+
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
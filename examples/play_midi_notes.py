@@ -90,5 +90,9 @@ args = parser.parse_args()
 # Instantiate our Bitwig OSC client library with the command line arguments.
 bw = BitwigOSC(args.ip, args.port, args.chan)
 
-# Run the main routine.
-run(bw)
+# Run the main routine. The notes are turned off automatically when you
+# press ctrl-c, so all that's left to do is quit quietly.
+try:
+    run(bw)
+except KeyboardInterrupt:
+    print('You pressed ctrl-c. Turned off all notes, quitting...')
@@ -0,0 +1,171 @@
+""" Bitwig OSC Python3 command runner tests.
+
+    These tests don't need Bitwig to be running, since the messages are
+    captured before they are sent. """
+
+# Add one directory level up to the Python module search path.
+# Only needed if your Python file is in a subdirectory.
+if __name__ == '__main__' and __package__ is None:
+    from os import sys, path
+    sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+# Import the Moss Bitwig OSC API client library, and some other stuff.
+from bitwig_osc import BitwigOSC, VirtualClock
+from bitwig_osc import MAX_BUNDLE_SIZE
+from pythonosc import osc_message_builder
+import bitwig_osc_cli
+import contextlib
+import io
+import socket
+import unittest
+
+
+class CapturingClient:
+    """ Records everything that would have been sent to the OSC server. """
+
+    def __init__(self):
+        self.messages = []  # (address, value) pairs from send_message().
+        self.sent = []      # Messages and bundles from send().
+
+    def send_message(self, address, value):
+        # Encode the message like SimpleUDPClient does, so bad values fail.
+        builder = osc_message_builder.OscMessageBuilder(address=address)
+        builder.add_arg(value)
+        builder.build()
+        self.messages.append((address, value))
+
+    def send(self, content):
+        self.sent.append(content)
+
+
+class Runner(unittest.TestCase):
+    def setUp(self):
+        # A throwaway port for the notes that are turned off on cleanup.
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.server.bind(("127.0.0.1", 0))
+
+        # Instantiate the Moss Bitwig OSC client library, and capture
+        # everything it sends.
+        self.clock = VirtualClock()
+        self.bw = BitwigOSC(port=self.server.getsockname()[1],
+                            clock=self.clock)
+        self.client = CapturingClient()
+        self.bw.client = self.client
+
+    def tearDown(self):
+        # Turn off any notes that were left playing.
+        self.bw.panic()
+        self.server.close()
+
+    def test_run(self):
+        """ Each line is sent as one message through the same client. """
+        lines = ["# Scene 1", "", "record_arm_track 3",
+                 "play_note 60 100", "raw_tempo 420",
+                 "automation_write_mode touch"]
+
+        errors = bitwig_osc_cli.run(self.bw, lines)
+
+        self.assertEqual(errors, 0)
+        self.assertEqual(self.client.messages, [
+            ("/track/3/recarm", 1),
+            ("/vkb_midi/1/note/60", 100),
+            ("/tempo/raw", 420),
+            ("/automationWriteMode", "touch"),
+        ])
+
+    def test_unknown_command(self):
+        """ Bad commands are reported and skipped. """
+        err = io.StringIO()
+        lines = ["no_such_command", "__del__", "signal_handler 2 0",
+                 "play_note 1 2 3 4 5", "undo"]
+
+        errors = bitwig_osc_cli.run(self.bw, lines, err=err)
+
+        self.assertEqual(errors, 4)
+        self.assertEqual(self.client.messages, [("/undo", "-")])
+        self.assertIn("line 1:", err.getvalue())
+
+    def test_build_error(self):
+        """ Values that can't be encoded are reported and skipped, with
+            or without batching. """
+        for batch in (1, 2):
+            err = io.StringIO()
+            self.client.messages = []
+            lines = ["raw_tempo 99999999999999999999999", "undo"]
+
+            errors = bitwig_osc_cli.run(self.bw, lines, batch=batch, err=err)
+
+            self.assertEqual(errors, 1)
+            self.assertIn("line 1:", err.getvalue())
+            if batch == 1:
+                self.assertEqual(self.client.messages, [("/undo", "-")])
+            else:
+                self.assertEqual(self.client.sent[-1].num_contents, 1)
+
+    def test_batch(self):
+        """ Batched commands are sent together in bundles. """
+        lines = ["play_note " + str(i) for i in range(5)]
+
+        errors = bitwig_osc_cli.run(self.bw, lines, batch=2)
+
+        self.assertEqual(errors, 0)
+        self.assertEqual(self.client.messages, [])
+        self.assertEqual([b.num_contents for b in self.client.sent],
+                         [2, 2, 1])
+
+        # The real client is put back afterwards.
+        self.assertIs(self.bw.client, self.client)
+
+    def test_batch_size_limit(self):
+        """ Big batches are split into bundles that fit in a UDP packet. """
+        lines = ["stop_all_notes both"] * 16
+
+        errors = bitwig_osc_cli.run(self.bw, lines, batch=16)
+
+        self.assertEqual(errors, 0)
+        self.assertGreater(len(self.client.sent), 1)
+        for bundle in self.client.sent:
+            self.assertLessEqual(bundle.size, MAX_BUNDLE_SIZE)
+        self.assertEqual(sum(b.num_contents for b in self.client.sent),
+                         16 * 256)
+
+    def test_batch_send_error(self):
+        """ A bundle that can't be sent is reported, not fatal. """
+        err = io.StringIO()
+
+        def fail(content):
+            raise OSError("Message too long")
+        self.client.send = fail
+
+        errors = bitwig_osc_cli.run(self.bw, ["undo", "redo", "undo"],
+                                    batch=2, err=err)
+
+        self.assertEqual(errors, 2)
+        self.assertIn("line 2: Message too long", err.getvalue())
+        self.assertIn("line 3: Message too long", err.getvalue())
+
+    def test_missing_file(self):
+        """ A missing command file is a usage error, not a traceback. """
+        with self.assertRaises(SystemExit) as cm, \
+                contextlib.redirect_stderr(io.StringIO()):
+            bitwig_osc_cli.main(["/no/such/commands.txt"])
+        self.assertEqual(cm.exception.code, 2)
+
+    def test_interval(self):
+        """ The runner waits after each command, or each bundle. """
+        lines = ["play_note " + str(i) for i in range(5)]
+
+        bitwig_osc_cli.run(self.bw, lines, interval=0.01)
+        self.assertEqual(self.clock.now_ns(), 50000000)
+
+        bitwig_osc_cli.run(self.bw, lines, batch=2, interval=0.01)
+        # Only full bundles are waited after, not the leftover one.
+        self.assertEqual(self.clock.now_ns(), 70000000)
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == "__main__":
+    main()
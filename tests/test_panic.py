@@ -0,0 +1,230 @@
+""" Bitwig OSC Python3 panic tests.
+
+    These tests don't need Bitwig to be running, since the note offs are
+    sent to a socket of our own instead. """
+
+# Add one directory level up to the Python module search path.
+# Only needed if your Python file is in a subdirectory.
+if __name__ == '__main__' and __package__ is None:
+    from os import sys, path
+    sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+# Import the Moss Bitwig OSC API client library, and some other stuff.
+from bitwig_osc import BitwigOSC, PanicHandler, VirtualClock
+from bitwig_osc import MAX_BUNDLE_SIZE, PANIC_SIGNALS
+from pythonosc import osc_bundle
+from unittest import mock
+import atexit
+import os
+import signal
+import socket
+import subprocess
+import sys
+import unittest
+
+
+class Panic(unittest.TestCase):
+    def setUp(self):
+        # Listen for the note offs like an OSC server would.
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.server.bind(("127.0.0.1", 0))
+        self.server.settimeout(1)
+
+        # Point the client library at our server.
+        self.bw = BitwigOSC(port=self.server.getsockname()[1],
+                            clock=VirtualClock(), panic_redundancy=2)
+
+    def tearDown(self):
+        self.bw.panic()
+        self.server.close()
+
+    def receive(self):
+        """ The (address, value) pairs from every bundle received, and the
+            number of bundles. """
+        messages = []
+        bundles = 0
+
+        self.server.setblocking(False)
+        try:
+            while True:
+                dgram = self.server.recv(65536)
+                self.assertLessEqual(len(dgram), MAX_BUNDLE_SIZE)
+                bundles += 1
+                for msg in osc_bundle.OscBundle(dgram):
+                    messages.append((msg.address, msg.params[0]))
+        except BlockingIOError:
+            pass
+
+        return messages, bundles
+
+    def test_panic(self):
+        """ Only the notes that are still on get turned off, on the
+            channel they were played on, once for each redundancy. """
+        self.bw.play_note(60)
+        self.bw.play_note(61)
+        self.bw.stop_note(61)
+        self.bw.play_note(36, 127, "drum", chan=10)
+        for _ in range(4):
+            self.server.recv(65536)
+
+        self.bw.panic()
+
+        messages, bundles = self.receive()
+        self.assertEqual(bundles, 2)
+        self.assertEqual(sorted(messages), sorted([
+            ("/vkb_midi/1/note/60", 0),
+            ("/vkb_midi/10/drum/36", 0),
+        ] * 2))
+
+        # Panicking again doesn't send anything.
+        self.bw.panic()
+        self.assertEqual(self.receive(), ([], 0))
+
+    def test_panic_many_notes(self):
+        """ Lots of notes are split into bundles that fit in a packet. """
+        self.bw.panic_redundancy = 1
+        for i in range(128):
+            self.bw.play_note(i)
+            self.bw.play_note(i, 127, "drum")
+        for _ in range(256):
+            self.server.recv(65536)
+
+        self.bw.panic()
+
+        messages, bundles = self.receive()
+        self.assertEqual(len(messages), 256)
+        self.assertGreater(bundles, 1)
+        self.assertLess(bundles, 256)
+
+    def test_budget(self):
+        """ Once the budget runs out, only the first bundle is sent. """
+        self.bw.panic_redundancy = 3
+        self.bw.panic_budget = 0
+        for i in range(128):
+            self.bw.play_note(i)
+        for _ in range(128):
+            self.server.recv(65536)
+
+        self.bw.panic()
+
+        self.assertEqual(self.receive()[1], 1)
+
+    def test_shared_deadline(self):
+        """ All instances share the smallest budget, and each one still
+            gets its first bundle sent. """
+        other = BitwigOSC(port=self.server.getsockname()[1],
+                          panic_budget=10)
+        handler = PanicHandler()
+        handler.instances.add(self.bw)
+        handler.instances.add(other)
+        self.bw.panic_budget = 0
+        for i in range(128):
+            self.bw.play_note(i)
+            other.play_note(i)
+        for _ in range(256):
+            self.server.recv(65536)
+
+        handler.panic()
+
+        self.assertEqual(self.receive()[1], 2)
+
+    def test_del_after_failed_init(self):
+        """ Cleanup doesn't fail if __init__ didn't finish. """
+        bw = BitwigOSC.__new__(BitwigOSC)
+        bw.__del__()
+
+
+class Signals(unittest.TestCase):
+    def setUp(self):
+        # Listen for the note offs like an OSC server would.
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.server.bind(("127.0.0.1", 0))
+        self.server.settimeout(1)
+        self.bw = BitwigOSC(port=self.server.getsockname()[1])
+
+        # Save the signal handlers so we can put them back afterwards.
+        self.saved = {sig: signal.getsignal(sig) for sig in PANIC_SIGNALS}
+
+    def tearDown(self):
+        for sig, handler in self.saved.items():
+            signal.signal(sig, handler)
+        self.bw.panic()
+        self.server.close()
+
+    def register(self):
+        """ A fresh panic handler for our instance, registered without
+            touching atexit. """
+        handler = PanicHandler()
+        handler.instances.add(self.bw)
+        with mock.patch.object(atexit, "register") as atexit_register:
+            handler.register()
+        atexit_register.assert_called_once_with(handler.panic)
+        return handler
+
+    def play(self):
+        """ Start a note, and skip past its message. """
+        self.bw.play_note(60)
+        self.server.recv(65536)
+
+    def test_chaining(self):
+        """ The signal handler that was there before is still called. """
+        calls = []
+        signal.signal(signal.SIGINT, lambda sig, frame: calls.append(sig))
+        handler = self.register()
+        self.assertEqual(signal.getsignal(signal.SIGINT),
+                         handler.signal_handler)
+
+        self.play()
+        os.kill(os.getpid(), signal.SIGINT)
+
+        self.assertEqual(calls, [signal.SIGINT])
+        self.assertEqual(self.server.recv(65536)[:8], b"#bundle\x00")
+
+    def test_keyboard_interrupt(self):
+        """ Ctrl-c still raises KeyboardInterrupt after the notes are
+            turned off. """
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        self.register()
+
+        self.play()
+        with self.assertRaises(KeyboardInterrupt):
+            os.kill(os.getpid(), signal.SIGINT)
+        self.assertEqual(self.server.recv(65536)[:8], b"#bundle\x00")
+
+    def test_ignored(self):
+        """ Ignored signals are still ignored. """
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        self.register()
+
+        self.play()
+        os.kill(os.getpid(), signal.SIGTERM)
+        self.assertEqual(self.server.recv(65536)[:8], b"#bundle\x00")
+
+    def test_default(self):
+        """ Signals with the default handler still kill the program. """
+        script = (
+            "import os, signal, sys\n"
+            "sys.path.insert(0, sys.argv[1])\n"
+            "from bitwig_osc import BitwigOSC\n"
+            "signal.signal(signal.SIGTERM, signal.SIG_DFL)\n"
+            "bw = BitwigOSC(port=int(sys.argv[2]))\n"
+            "bw.play_note(60)\n"
+            "os.kill(os.getpid(), signal.SIGTERM)\n"
+            "sys.exit(0)\n")
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+        result = subprocess.run(
+            [sys.executable, "-c", script, root,
+             str(self.server.getsockname()[1])])
+
+        self.assertEqual(result.returncode, -signal.SIGTERM)
+        self.server.recv(65536)
+        self.assertEqual(self.server.recv(65536)[:8], b"#bundle\x00")
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == "__main__":
+    main()
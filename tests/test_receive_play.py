@@ -5,7 +5,11 @@
     and a MIDI Drum track for track 2 with a drumkit that has at least 
     two drums. All tracks should be record disarmed initially. There is
     an example Bitwig project in the bitwig-projects/ folder which fits 
-    this criteria. """
+    this criteria.
+
+    The tests use a VirtualClock by default, so they finish right away and
+    the notes are too short to hear. Set the BITWIG_OSC_REAL_TIME
+    environment variable to 1 to play them in real time instead. """
 
 # Add one directory level up to the Python module search path.
 # Only needed if your Python file is in a subdirectory.
@@ -14,20 +18,58 @@ if __name__ == '__main__' and __package__ is None:
     sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
 
 # Import the Moss Bitwig OSC API client library, and some other stuff.
-from bitwig_osc import BitwigOSC
+from bitwig_osc import BitwigOSC, SystemClock, VirtualClock
+import os
 import unittest
-import time
+
+
+class RecordingClient:
+    """ Passes messages through to the real OSC client, and records the
+        clock time each one was sent at. """
+
+    def __init__(self, client, clock):
+        self.client = client  # The real OSC client.
+        self.clock = clock    # The clock to timestamp the messages with.
+        self.sent = []        # (time_ns, address, value) for each message.
+
+    def send_message(self, address, value):
+        self.sent.append((self.clock.now_ns(), address, value))
+        self.client.send_message(address, value)
 
 
 class Note(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
+        # Use the real clock only if we want to listen along.
+        if os.environ.get("BITWIG_OSC_REAL_TIME") == "1":
+            cls.clock = SystemClock()
+        else:
+            cls.clock = VirtualClock()
+
         # Instantiate the Moss Bitwig OSC client library.
-        cls.bw = BitwigOSC()
+        cls.bw = BitwigOSC(clock=cls.clock)
 
         # Record disarm the tracks to get a good initial state.
         cls.bw.record_disarm_first_eight_tracks()
 
+    def setUp(self):
+        # Record when each message gets sent.
+        self.recorder = RecordingClient(self.bw.client, self.clock)
+        self.bw.client = self.recorder
+
+    def tearDown(self):
+        self.bw.client = self.recorder.client
+
+    def assertNoteTimes(self, address, on_ns, off_ns):
+        """ Check that a note was turned on and off at exactly the right
+            times. Only possible with a VirtualClock. """
+        if not isinstance(self.clock, VirtualClock):
+            return
+
+        times = [(t, v) for t, a, v in self.recorder.sent if a == address]
+        self.assertEqual(times[0][0], on_ns)
+        self.assertEqual(times[-1], (off_ns, 0))
+
     def test_play(self):
         """ A medium-velocity rising sweep, using play_note() and 
             stop_note(). You'll need a synth with all the keys mapped,
@@ -35,6 +77,8 @@ class Note(unittest.TestCase):
         # Record arm the appropriate track so we can hear it.
         self.bw.record_arm_track()
 
+        start = self.clock.now_ns()
+
         # Loop over the range 0-128 exclusive. This is because
         # there are 127 MIDI notes available, and we want to play
         # ALL OF THEM!
@@ -43,12 +87,18 @@ class Note(unittest.TestCase):
             self.bw.play_note(i, 50)
 
             # Sustain the note for 5 hundredths of a second.
-            time.sleep(0.05)
+            self.bw.wait(0.05)
 
             # Turn the note off. This function is a shortcut for
             # calling play_note(i, 0).
             self.bw.stop_note(i)
 
+        # Each note should have lasted exactly 50 milliseconds.
+        for i in range(128):
+            self.assertNoteTimes("/vkb_midi/1/note/" + str(i),
+                                 start + i * 50000000,
+                                 start + (i + 1) * 50000000)
+
         # Record disarm the appropriate track so we can't hear it anymore.
         self.bw.record_disarm_track()
 
@@ -60,6 +110,8 @@ class Note(unittest.TestCase):
         # Record arm the appropriate track so we can hear it.
         self.bw.record_arm_track(2)
 
+        start = self.clock.now_ns()
+
         # Loop over the range 0-2 exclusive. This is because
         # we want to play 2 drums.
         for i in range(20):
@@ -72,12 +124,17 @@ class Note(unittest.TestCase):
             self.bw.play_note(drum, 127, "drum")
 
             # Sustain the note for 5 hundredths of a second.
-            time.sleep(0.2)
+            self.bw.wait(0.2)
 
             # Turn the note off. This function is a shortcut for
             # calling play_note(i, 0).
             self.bw.stop_note(drum, "drum")
 
+        # The second drum should start after the first one, and stop
+        # with the last hit.
+        self.assertNoteTimes("/vkb_midi/1/drum/37",
+                             start + 200000000, start + 4000000000)
+
         # Record disarm the appropriate track so we can't hear it anymore.
         self.bw.record_disarm_track(2)
 
@@ -91,7 +148,7 @@ class Note(unittest.TestCase):
 
         # Middle C.
         self.bw.play_note()
-        time.sleep(0.5)
+        self.bw.wait(0.5)
 
         # Stop the note before shifting octaves, because the change
         # won't take effect for notes that are currently playing.
@@ -102,14 +159,14 @@ class Note(unittest.TestCase):
 
         # Play C1 even though we are sending the MIDI note for C2.
         self.bw.play_note()
-        time.sleep(0.5)
+        self.bw.wait(0.5)
         self.bw.stop_note()
 
         # Set the octave back to what it should be, since this
         # change is permanent.
         self.bw.octave_up()
         self.bw.play_note()
-        time.sleep(0.5)
+        self.bw.wait(0.5)
         self.bw.stop_note()
 
         # Record disarm the appropriate track so we can't hear it anymore.